@@ -0,0 +1,465 @@
+"""
+analytics.py
+
+Records finished games to a file and analyses large batches of recorded games.
+
+Games are read in batches into columnar NumPy arrays (one row per game or per
+ply) and every statistic is computed with vectorized passes over those arrays,
+so a day's worth of self-play can be analysed without a Python loop per move.
+
+Record format (one game per line):
+    <first mover> <winner> <state>:<from_row><from_col><to_row><to_col> ...
+    e.g. 1 1 222000111:2111 202010111:0111 ...
+
+Statistics:
+    - win rate of the first mover, by which player moved first
+    - first mover win rate for each opening move
+    - visit and win counts for each (position, player to move)
+    - histogram of game lengths (in plies)
+    - blunder rate of each player against the solved game values
+
+NOTES:
+    positions are encoded as base 3 int64 values, so boards larger than 6x6
+    are not supported (a ValueError is raised).
+    solved values follow the rules in game_graph.expand(). HexapawnGame.check_game_over()
+    has its own end of game check, which always looks at player 1's legal moves, so a
+    recorded game can end (or go on) where the solved values say it should not. Blunder
+    rates for such games are measured against the game_graph rules.
+"""
+import numpy as np
+
+from game_graph import build_graph
+
+MAX_SIZE = 6 # largest board whose base 3 state codes fit in an int64
+
+
+def _check_size(size):
+    """
+    Makes sure a board size is supported by the state encoding and record format.
+
+    Args:
+        size (int): The size of the board (number of rows or columns).
+    """
+    if size > MAX_SIZE:
+        raise ValueError(f'Board sizes above {MAX_SIZE}x{MAX_SIZE} are not supported.')
+
+
+def format_game(game_history, first_mover, winner_position):
+    """
+    Converts a finished game into a single record line.
+
+    Args:
+        game_history (list): The game history represented as a list of (state, move) tuples.
+        first_mover (int): The player number of the player who moved first.
+        winner_position (int): The player number of the winner.
+
+    Returns:
+        (str): The record line, without a trailing newline.
+    """
+    plies = [f'{state}:{fr}{fc}{tr}{tc}' for state, ((fr, fc), (tr, tc)) in game_history]
+    return ' '.join([str(first_mover), str(winner_position)] + plies)
+
+
+class GameRecorder:
+    """
+    Appends finished games to a record file.
+    """
+
+    def __init__(self, path):
+        """
+        Constructor.
+
+        Args:
+            path (str): The record file. Games are appended if it already exists.
+        """
+        self.path = path
+        self.file = open(path, 'a', buffering=1) # line buffered so a crash loses at most the current game
+
+
+    def record(self, game_history, first_mover, winner_position):
+        """
+        Writes a finished game to the record file.
+
+        Args:
+            game_history (list): The game history represented as a list of (state, move) tuples.
+            first_mover (int): The player number of the player who moved first.
+            winner_position (int): The player number of the winner.
+        """
+        self.file.write(format_game(game_history, first_mover, winner_position) + '\n')
+
+
+    def close(self):
+        self.file.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class GameBatch:
+    """
+    A batch of recorded games stored as columnar arrays.
+
+    Per game arrays:
+        first_movers, winners, lengths, offsets (index of the game's first ply)
+
+    Per ply arrays:
+        game_idx, ply_idx, movers, states (cells per row), moves (from_row, from_col, to_row, to_col)
+    """
+
+    def __init__(self, lines, size=3):
+        """
+        Constructor.
+
+        Args:
+            lines (list): Record lines, one per game.
+            size (int): The size of the board (number of rows or columns).
+        """
+        _check_size(size)
+        self.size = size
+        cells = size * size
+        width = cells + 6 # '<state>:<move> ' is a fixed width ply record
+
+        first_movers, winners, plies = [], [], []
+        for line in lines:
+            first_mover, winner, *rest = line.split(None, 2)
+            first_movers.append(first_mover)
+            winners.append(winner)
+            plies.append(rest[0].rstrip() + ' ' if rest else '')
+
+        self.first_movers = np.array(first_movers, dtype=np.int8)
+        self.winners = np.array(winners, dtype=np.int8)
+        self.lengths = np.array([len(game) for game in plies], dtype=np.int64) // width
+        self.offsets = np.zeros(len(self.lengths), dtype=np.int64)
+        self.offsets[1:] = np.cumsum(self.lengths)[:-1]
+
+        # every ply of the batch is parsed by one bulk conversion instead of one per move
+        text = ''.join(plies).encode('ascii')
+        if len(text) != self.lengths.sum() * width:
+            raise ValueError(f'Ply records must be {cells} squares, a colon, and 4 move digits.')
+        records = (np.frombuffer(text, dtype=np.uint8) - ord('0')).reshape(-1, width)
+        self.states = records[:, :cells]
+        self.moves = records[:, cells+1:cells+5]
+
+        self.game_idx = np.repeat(np.arange(len(self.lengths)), self.lengths)
+        self.ply_idx = np.arange(len(self.game_idx)) - np.repeat(self.offsets, self.lengths)
+        first = self.first_movers[self.game_idx]
+        self.movers = np.where(self.ply_idx % 2 == 0, first, 3 - first).astype(np.int8)
+
+
+    def __len__(self):
+        return len(self.lengths)
+
+
+    def state_codes(self):
+        """
+        Returns:
+            (np.ndarray): Each ply's board state as a base 3 integer.
+        """
+        return self.states.astype(np.int64) @ (3 ** np.arange(self.size * self.size, dtype=np.int64))
+
+
+    def move_codes(self):
+        """
+        Returns:
+            (np.ndarray): Each ply's move as a base size integer.
+        """
+        moves = self.moves.astype(np.int64)
+        return ((moves[:, 0] * self.size + moves[:, 1]) * self.size + moves[:, 2]) * self.size + moves[:, 3]
+
+
+def read_games(path, size=3, batch_size=100000):
+    """
+    Streams a record file in batches.
+
+    Args:
+        path (str): The record file.
+        size (int): The size of the board (number of rows or columns).
+        batch_size (int): The number of games per batch.
+
+    Yields:
+        (GameBatch): The next batch of games.
+    """
+    with open(path) as file:
+        lines = []
+        for line in file:
+            if line.strip():
+                lines.append(line)
+            if len(lines) == batch_size:
+                yield GameBatch(lines, size)
+                lines = []
+        if lines:
+            yield GameBatch(lines, size)
+
+
+def encode_state(state):
+    """
+    Converts a string representation of the board into a base 3 integer.
+
+    Args:
+        state (str): A string representation of the board.
+
+    Returns:
+        (int): The encoded state.
+    """
+    return sum(int(square) * 3**index for index, square in enumerate(state))
+
+
+def decode_state(code, size=3):
+    """
+    Converts a base 3 integer back into a string representation of the board.
+
+    Args:
+        code (int): The encoded state.
+        size (int): The size of the board (number of rows or columns).
+
+    Returns:
+        (str): A string representation of the board.
+    """
+    squares = []
+    for _ in range(size * size):
+        code, square = divmod(int(code), 3)
+        squares.append(str(square))
+    return ''.join(squares)
+
+
+def solve(size=3, graph=None):
+    """
+    Solves the game by searching every position reachable from the start, with either player moving first.
+
+    Args:
+        size (int): The size of the board (number of rows or columns).
+        graph (dict): A game graph from game_graph.load_graph(). Optional, built with game_graph.build_graph() if not given.
+
+    Returns:
+        solved (dict): Maps (state, player to move) to 1 if the player to move wins, -1 if they lose.
+    """
+    if graph is None:
+        graph = build_graph(size, start_players=(1, 2))
+
+    solved = {}
+    for node in graph:
+        _solve_node(solved, graph, node)
+    return solved
+
+
+def _solve_node(solved, graph, node):
+    """
+    Finds the value of a game graph node for the player to move.
+
+    Args:
+        solved (dict): Maps (state, player to move) to solved values.
+        graph (dict): Maps (state, player to move) to a list of (move, child state) tuples.
+        node (tuple): A (state, player to move) tuple.
+
+    Returns:
+        (int): 1 if the player to move wins, -1 if they lose.
+    """
+    if node in solved:
+        return solved[node]
+
+    opponent = 2 if node[1] == 1 else 1
+    value = -1 # nodes with no moves are game over for the player to move
+    for _, child in graph[node]:
+        if -_solve_node(solved, graph, (child, opponent)) == 1:
+            value = 1
+
+    solved[node] = value
+    return value
+
+
+class GameStats:
+    """
+    Aggregate statistics over any number of game batches.
+    """
+
+    def __init__(self, size=3, solved=None):
+        """
+        Constructor.
+
+        Args:
+            size (int): The size of the board (number of rows or columns).
+            solved (dict): Maps (state, player to move) to solved values. Optional, blunders are not counted if not given or empty.
+        """
+        _check_size(size)
+        self.size = size
+        self.games = 0
+        self.first_mover_games = np.zeros(3, dtype=np.int64)   # indexed by player number
+        self.first_mover_wins = np.zeros(3, dtype=np.int64)
+        self.opening_games = np.zeros(size**4, dtype=np.int64) # indexed by move code
+        self.opening_wins = np.zeros(size**4, dtype=np.int64)
+        self.lengths = np.zeros(0, dtype=np.int64)             # game length histogram
+        self.position_keys = np.zeros(0, dtype=np.int64)       # state code * 2 + (player to move - 1)
+        self.position_visits = np.zeros(0, dtype=np.int64)
+        self.position_wins = np.zeros(0, dtype=np.int64)
+        self.blunder_chances = np.zeros(3, dtype=np.int64)     # plies played from a winning position
+        self.blunders = np.zeros(3, dtype=np.int64)            # of those, plies that threw away the win
+
+        self.solved_keys = None
+        self.solved_values = None
+        if solved:
+            keys = np.array([encode_state(state) * 2 + (player - 1) for state, player in solved], dtype=np.int64)
+            values = np.array(list(solved.values()), dtype=np.int8)
+            order = np.argsort(keys)
+            self.solved_keys, self.solved_values = keys[order], values[order]
+
+
+    def update(self, batch):
+        """
+        Adds a batch of games to the statistics.
+
+        Args:
+            batch (GameBatch): The games.
+        """
+        if len(batch) == 0:
+            return
+        self.games += len(batch)
+
+        first_won = batch.first_movers == batch.winners
+        self.first_mover_games += np.bincount(batch.first_movers, minlength=3)
+        self.first_mover_wins += np.bincount(batch.first_movers[first_won], minlength=3)
+
+        played = batch.lengths > 0
+        openings = batch.move_codes()[batch.offsets[played]]
+        self.opening_games += np.bincount(openings, minlength=self.size**4)
+        self.opening_wins += np.bincount(openings[first_won[played]], minlength=self.size**4)
+
+        histogram = np.bincount(batch.lengths)
+        if len(histogram) > len(self.lengths):
+            self.lengths = np.pad(self.lengths, (0, len(histogram) - len(self.lengths)))
+        self.lengths[:len(histogram)] += histogram
+
+        keys = batch.state_codes() * 2 + (batch.movers - 1)
+        mover_won = (batch.movers == batch.winners[batch.game_idx]).astype(np.int64)
+        self._add_positions(keys, mover_won)
+
+        if self.solved_keys is not None:
+            self._add_blunders(batch, keys)
+
+
+    def _add_positions(self, keys, mover_won):
+        """
+        Merges position visit and win counts into the running totals.
+
+        Args:
+            keys (np.ndarray): Position keys, one per ply.
+            mover_won (np.ndarray): 1 where the player to move went on to win, else 0.
+        """
+        all_keys = np.concatenate((self.position_keys, keys))
+        all_visits = np.concatenate((self.position_visits, np.ones(len(keys), dtype=np.int64)))
+        all_wins = np.concatenate((self.position_wins, mover_won))
+
+        self.position_keys, inverse = np.unique(all_keys, return_inverse=True)
+        self.position_visits = np.bincount(inverse, weights=all_visits).astype(np.int64)
+        self.position_wins = np.bincount(inverse, weights=all_wins).astype(np.int64)
+
+
+    def _lookup(self, keys):
+        """
+        Gets solved values for position keys.
+
+        Args:
+            keys (np.ndarray): Position keys.
+
+        Returns:
+            (np.ndarray): The solved values, 0 where a position is not in the solved table.
+        """
+        index = np.searchsorted(self.solved_keys, keys).clip(max=len(self.solved_keys)-1)
+        return np.where(self.solved_keys[index] == keys, self.solved_values[index], 0)
+
+
+    def _add_blunders(self, batch, keys):
+        """
+        Counts plies where the player to move was winning and made a move that
+        left the opponent winning.
+
+        The position after a ply is the next ply's position. The last ply of
+        a game always wins it, so it is never a blunder.
+
+        Args:
+            batch (GameBatch): The games.
+            keys (np.ndarray): Position keys, one per ply.
+        """
+        winning = self._lookup(keys) == 1
+        after = np.zeros(len(keys), dtype=np.int8)
+        continues = np.zeros(len(keys), dtype=bool)
+        continues[:-1] = batch.game_idx[1:] == batch.game_idx[:-1]
+        after[:-1] = self._lookup(keys[1:])
+        blunder = winning & continues & (after == 1)
+
+        self.blunder_chances += np.bincount(batch.movers[winning], minlength=3)
+        self.blunders += np.bincount(batch.movers[blunder], minlength=3)
+
+
+    def win_rate_by_first_mover(self):
+        """
+        Returns:
+            (dict): Maps player number to the win rate of that player in games they moved first.
+        """
+        return {player: float(self.first_mover_wins[player] / self.first_mover_games[player])
+                for player in (1, 2) if self.first_mover_games[player]}
+
+
+    def opening_win_rates(self):
+        """
+        Returns:
+            (dict): Maps each opening move played to (games, first mover win rate).
+        """
+        rates = {}
+        for code in np.flatnonzero(self.opening_games):
+            games, wins = self.opening_games[code], self.opening_wins[code]
+            rest, to_col = divmod(int(code), self.size)
+            rest, to_row = divmod(rest, self.size)
+            from_row, from_col = divmod(rest, self.size)
+            rates[((from_row, from_col), (to_row, to_col))] = (int(games), float(wins / games))
+        return rates
+
+
+    def position_frequencies(self):
+        """
+        Returns:
+            (tuple): Columnar arrays of (state codes, player to move, visits, wins by the player to move).
+                Use decode_state() to turn a state code back into a board string.
+        """
+        return self.position_keys // 2, self.position_keys % 2 + 1, self.position_visits, self.position_wins
+
+
+    def length_histogram(self):
+        """
+        Returns:
+            (np.ndarray): The number of games of each length, indexed by number of plies.
+        """
+        return self.lengths
+
+
+    def blunder_rates(self):
+        """
+        Returns:
+            (dict): Maps player number to the fraction of winning positions where that player made a losing move.
+        """
+        return {player: float(self.blunders[player] / self.blunder_chances[player])
+                for player in (1, 2) if self.blunder_chances[player]}
+
+
+def analyse(path, size=3, solved=None, batch_size=100000):
+    """
+    Computes statistics for every game in a record file.
+
+    Args:
+        path (str): The record file.
+        size (int): The size of the board (number of rows or columns).
+        solved (dict): Maps (state, player to move) to solved values. Optional, solve() is used if not given.
+        batch_size (int): The number of games per batch.
+
+    Returns:
+        stats (GameStats): The statistics.
+    """
+    _check_size(size)
+    stats = GameStats(size, solved if solved is not None else solve(size))
+    for batch in read_games(path, size, batch_size):
+        stats.update(batch)
+    return stats
@@ -0,0 +1,302 @@
+"""
+game_graph.py
+
+Enumerates the full game graph (every reachable state, the player to move,
+and the moves between states) for any board size using several processes.
+
+The graph is expanded breadth first, one ply at a time. Each node is owned by
+one shard (chosen by a hash of the node) and each shard is handled by its own
+worker process, which keeps the set of nodes it has already seen. After
+expanding its part of the frontier, a worker sends every child to the shard
+that owns it, so duplicates are removed without any process holding the whole
+graph. Each worker writes the nodes it expanded to one file per ply.
+
+Output directory:
+    manifest.txt             - board size, number of shards, and number of plies
+    ply_<ply>_<shard>.txt    - one line per node:
+                               <state> <player to move> <move>:<child state> ...
+                               where a move is <from_row><from_col><to_row><to_col>.
+                               The player to move in a child state is the other player.
+                               Nodes with no moves are game over (the player to move lost).
+
+NOTES:
+    coordinates are written as single digits, so boards larger than 10x10
+    are not supported (a ValueError is raised).
+"""
+import os
+import queue
+import zlib
+import multiprocessing as mp
+
+from board import Board
+
+MAX_SIZE = 10 # largest board whose coordinates are single digits
+_POLL_SECONDS = 1.0 # how often the coordinator checks that the workers are still running
+
+
+def _check_size(size):
+    """
+    Makes sure a board size is supported by the file format.
+
+    Args:
+        size (int): The size of the board (number of rows or columns).
+    """
+    if size > MAX_SIZE:
+        raise ValueError(f'Board sizes above {MAX_SIZE}x{MAX_SIZE} are not supported.')
+
+
+def _owner(node, num_shards):
+    """
+    Gets the shard that owns a node. Uses crc32 since the built-in hash of a
+    string is different in each process.
+
+    Args:
+        node (tuple): A (state, player to move) tuple.
+        num_shards (int): The number of shards.
+
+    Returns:
+        (int): The shard number.
+    """
+    state, player = node
+    return zlib.crc32(f'{state}{player}'.encode('ascii')) % num_shards
+
+
+def expand(size, state, player):
+    """
+    Gets the moves out of a node.
+
+    Args:
+        size (int): The size of the board (number of rows or columns).
+        state (str): A string representation of the board.
+        player (int): The player whose turn it is.
+
+    Returns:
+        edges (list): A list of (move, child state) tuples. Empty if the game is over.
+    """
+    board = Board(size, state)
+    opponent = 2 if player == 1 else 1
+    opponent_goal = size-1 if opponent == 2 else 0
+
+    if any(row == opponent_goal for row, _ in board.get_player_positions(opponent)):
+        return [] # opponent promoted a pawn on the last move
+
+    edges = []
+    for move in board.get_legal_moves(player):
+        next_board = Board(size, state)
+        next_board.move_piece(*move)
+        edges.append((move, next_board.to_string()))
+    return edges
+
+
+def build_graph(size=3, start_players=(1,)):
+    """
+    Builds the game graph in memory, in a single process. Suited to small boards.
+
+    Args:
+        size (int): The size of the board (number of rows or columns).
+        start_players (tuple): The players that may move first.
+
+    Returns:
+        graph (dict): Maps (state, player to move) to a list of (move, child state) tuples.
+    """
+    _check_size(size)
+    graph = {}
+    frontier = [(Board(size).to_string(), player) for player in start_players]
+
+    while frontier:
+        node = frontier.pop()
+        if node in graph:
+            continue
+        state, player = node
+        graph[node] = expand(size, state, player)
+        child_player = 2 if player == 1 else 1
+        frontier.extend((child, child_player) for _, child in graph[node])
+
+    return graph
+
+
+def _layer_path(out_dir, ply, shard):
+    return os.path.join(out_dir, f'ply_{ply:03d}_{shard:03d}.txt')
+
+
+def _shard_worker(shard, num_shards, size, out_dir, start_nodes, inboxes, control, results):
+    """
+    Expands and deduplicates the nodes owned by one shard, one ply at a time.
+
+    Args:
+        shard (int): The shard number of this worker.
+        num_shards (int): The number of shards.
+        size (int): The size of the board (number of rows or columns).
+        out_dir (str): The directory to write layer files to.
+        start_nodes (list): The (state, player to move) tuples at ply 0.
+        inboxes (list): One queue per shard that children are sent to.
+        control (Queue): Tells this worker whether to expand another ply.
+        results (Queue): Receives the number of new nodes found by this worker each ply.
+    """
+    frontier = sorted(node for node in set(start_nodes) if _owner(node, num_shards) == shard)
+    seen = set(frontier)
+    ply = 0
+
+    while True:
+        buckets = [{} for _ in range(num_shards)] # dicts used as ordered sets
+        with open(_layer_path(out_dir, ply, shard), 'w') as file:
+            for state, player in frontier:
+                edges = expand(size, state, player)
+                child_player = 2 if player == 1 else 1
+                file.write(' '.join([state, str(player)] +
+                                    [f'{fr}{fc}{tr}{tc}:{child}' for ((fr, fc), (tr, tc)), child in edges]) + '\n')
+                for _, child in edges:
+                    node = (child, child_player)
+                    buckets[_owner(node, num_shards)][node] = None
+
+        # every worker sends exactly one message to every shard each ply
+        for other, bucket in enumerate(buckets):
+            inboxes[other].put(list(bucket))
+
+        new_nodes = set()
+        for _ in range(num_shards):
+            new_nodes.update(node for node in inboxes[shard].get() if node not in seen)
+        seen.update(new_nodes)
+        frontier = sorted(new_nodes)
+
+        results.put(len(frontier))
+        if not control.get():
+            break
+        ply += 1
+
+
+def enumerate_graph(size=3, out_dir='game_graph', workers=None, start_players=(1,)):
+    """
+    Enumerates the game graph and writes it to a directory.
+
+    Args:
+        size (int): The size of the board (number of rows or columns).
+        out_dir (str): The directory to write the graph to.
+        workers (int): The number of worker processes (and shards). Optional, defaults to the number of cores.
+        start_players (tuple): The players that may move first.
+
+    Returns:
+        (int): The number of nodes in the graph.
+    """
+    _check_size(size)
+    os.makedirs(out_dir, exist_ok=True)
+    _clear_output(out_dir)
+    workers = workers or os.cpu_count() or 1
+    start_nodes = [(Board(size).to_string(), player) for player in start_players]
+
+    inboxes = [mp.Queue() for _ in range(workers)]
+    controls = [mp.Queue() for _ in range(workers)]
+    results = mp.Queue()
+    processes = [mp.Process(target=_shard_worker,
+                            args=(shard, workers, size, out_dir, start_nodes, inboxes, controls[shard], results))
+                 for shard in range(workers)]
+    for process in processes:
+        process.start()
+
+    total = len(set(start_nodes))
+    plies = 0
+    while True:
+        new_nodes = sum(_collect_results(results, processes))
+        total += new_nodes
+        plies += 1
+
+        for control in controls:
+            control.put(new_nodes > 0)
+        if new_nodes == 0:
+            break
+
+    for process in processes:
+        process.join()
+
+    with open(os.path.join(out_dir, 'manifest.txt'), 'w') as file:
+        file.write(f'size {size}\nshards {workers}\nplies {plies}\n')
+
+    return total
+
+
+def _clear_output(out_dir):
+    """
+    Removes the manifest and layer files of an earlier run, so that an
+    interrupted run cannot be loaded as a mix of old and new layers.
+
+    Args:
+        out_dir (str): The directory the graph is written to.
+    """
+    for file_name in os.listdir(out_dir):
+        if file_name == 'manifest.txt' or (file_name.startswith('ply_') and file_name.endswith('.txt')):
+            os.remove(os.path.join(out_dir, file_name))
+
+
+def _collect_results(results, processes):
+    """
+    Waits for every worker to report the number of new nodes it found in a ply.
+
+    Args:
+        results (Queue): The queue the workers report to.
+        processes (list): The worker processes.
+
+    Returns:
+        counts (list): One count per worker.
+    """
+    counts = []
+    while len(counts) < len(processes):
+        try:
+            counts.append(results.get(timeout=_POLL_SECONDS))
+        except queue.Empty:
+            # workers only exit after the last ply, so any exit before then is a failure
+            failed = [process for process in processes if process.exitcode is not None]
+            if failed:
+                for process in processes:
+                    process.terminate()
+                for process in processes:
+                    process.join()
+                raise RuntimeError(f'Graph worker exited with code {failed[0].exitcode}, enumeration stopped.')
+    return counts
+
+
+def _read_manifest(out_dir):
+    with open(os.path.join(out_dir, 'manifest.txt')) as file:
+        return {key: int(value) for key, value in (line.split() for line in file if line.strip())}
+
+
+def load_graph(out_dir='game_graph'):
+    """
+    Loads a game graph written by enumerate_graph().
+
+    Args:
+        out_dir (str): The directory the graph was written to.
+
+    Returns:
+        graph (dict): Maps (state, player to move) to a list of (move, child state) tuples, in ply order.
+    """
+    manifest = _read_manifest(out_dir)
+    graph = {}
+
+    for ply in range(manifest['plies']):
+        for shard in range(manifest['shards']):
+            with open(_layer_path(out_dir, ply, shard)) as file:
+                for line in file:
+                    state, player, *edges = line.split()
+                    moves = []
+                    for edge in edges:
+                        move, child = edge.split(':')
+                        fr, fc, tr, tc = (int(digit) for digit in move)
+                        moves.append((((fr, fc), (tr, tc)), child))
+                    graph[(state, int(player))] = moves
+
+    return graph
+
+
+def load_states_and_moves(player_position, out_dir='game_graph'):
+    """
+    Loads the states where a given player is to move, in the form given to agents.
+
+    Args:
+        player_position (int): The play order position (player number) of the agent.
+        out_dir (str): The directory the graph was written to.
+
+    Returns:
+        states_and_moves (dict): Maps game states to that player's legal moves.
+    """
+    return {state: [move for move, _ in edges]
+            for (state, player), edges in load_graph(out_dir).items() if player == player_position}
@@ -20,11 +20,13 @@ class HexapawnGame:
     checks for a win.
     """
 
-    def __init__(self, player_1, player_2, board=None, start_player=None):
+    def __init__(self, player_1, player_2, board=None, start_player=None, recorder=None):
         self.players = [player_1, player_2]
         self.game_history = []                               # list of (board, move) tuples, board is a string, move is a tuple of int tuples
         self.board = board if board is not None else Board() # set up a new board if necessary
         self.current_player_idx = 0 if start_player is None else start_player - 1 # the position of the current player (start with player 1)
+        self.start_player_idx = self.current_player_idx
+        self.recorder = recorder                             # optional GameRecorder that saves finished games for analytics
         self.is_game_over = False
         self.winner_idx = None                               # the position of who won
 
@@ -85,7 +87,7 @@ class HexapawnGame:
     def send_report(self):
         """
         Outputs the results of the game. Calls the game_report function for
-        computer players. Prints game results.
+        computer players. Records the game if there is a recorder. Prints game results.
         """
         for index, player in enumerate(self.players):
             if isinstance(player, ComputerPlayer):
@@ -93,6 +95,9 @@ class HexapawnGame:
                 winner_position = self.winner_idx + 1
                 player.game_report(self.game_history, player_position, winner_position)
 
+        if self.recorder is not None:
+            self.recorder.record(self.game_history, self.start_player_idx + 1, self.winner_idx + 1)
+
         print(self.board)
         print(f'Game over! {self.players[self.winner_idx].name} wins!')
 
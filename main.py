@@ -13,6 +13,11 @@ from human_player import HumanPlayer
 from computer_player import ComputerPlayer
 from board import Board
 from hexapawn_game import HexapawnGame
+from shared_states import SharedStateTable
+from analytics import GameRecorder
+
+STATE_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'hexapawn_states.tbl')
+GAME_RECORD_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'hexapawn_games.txt') # read with analytics.analyse()
 
 # AGENT_REGISTRY = {
 #     'menace': Menace
@@ -99,9 +104,35 @@ def state_generator(states_and_moves, board, curr_player=1):
         state_generator(states_and_moves, next_board, next_player)
 
 
+def load_state_table(path=STATE_TABLE_PATH):
+    """
+    Opens the saved state table, generating and saving it first if it does not
+    exist or cannot be used (incomplete, or written by an older format version).
+    Move values saved in the table carry over between runs, delete the file to reset them.
+
+    Args:
+        path (str): The state table file.
+
+    Returns:
+        (SharedStateTable): Maps game states to legal moves.
+    """
+    if os.path.exists(path):
+        try:
+            return SharedStateTable.open_file(path)
+        except ValueError:
+            pass # rebuilt below
+
+    SharedStateTable.write_file(path, generate_states())
+    return SharedStateTable.open_file(path)
+
+
 def player_setup(player_position, states_and_moves=None, model_path=None):
     """
     Gets user input and sets up players.
+
+    Args:
+        player_position (int): The play order position of the player.
+        states_and_moves (dict): Maps game states to legal moves. Optional, generated if not given.
     """
     command_line = False
 
@@ -127,7 +158,8 @@ def player_setup(player_position, states_and_moves=None, model_path=None):
                 agent_file = rel_file_path  # change this to select relative or absolute and comment out one of the lines above
                 model_class = load_agent_class(agent_file, "Menace")
 
-                states_and_moves = generate_states()
+                if states_and_moves is None:
+                    states_and_moves = generate_states()
 
                 info = {
                     'player_position': player_position,
@@ -151,7 +183,8 @@ def player_setup(player_position, states_and_moves=None, model_path=None):
         agent_file = rel_file_path # change this to select relative or absolute and comment out one of the lines above
         model_class = load_agent_class(agent_file, "Menace")
 
-        states_and_moves = generate_states()
+        if states_and_moves is None:
+            states_and_moves = generate_states()
 
         info = {
             'player_position': player_position,
@@ -166,31 +199,33 @@ def player_setup(player_position, states_and_moves=None, model_path=None):
         return ComputerPlayer(f'player{player_position}', selected_model)
 
 
-def game_setup(board=None, start_player=None):
+def game_setup(board=None, start_player=None, states_and_moves=None, recorder=None):
     """
     Sets up a new game.
 
     Args:
         board (Board): A game board. Optional if starting a new game.
         start_player (int): The player whose move it is. Optional if starting a new game.
+        states_and_moves (dict): Maps game states to legal moves. Optional, generated if not given.
+        recorder (GameRecorder): Saves the finished game for analytics. Optional.
 
     Returns:
         (HexapawnGame): A game.
     """
-    player1 = player_setup(1)
-    player2 = player_setup(2)
+    player1 = player_setup(1, states_and_moves)
+    player2 = player_setup(2, states_and_moves)
 
     if board is None:
-        return HexapawnGame(player1, player2)
+        return HexapawnGame(player1, player2, recorder=recorder)
     else:
-        return HexapawnGame(player1, player2, board, start_player)
+        return HexapawnGame(player1, player2, board, start_player, recorder)
 
 
 def main():
+    states_and_moves = load_state_table() # built once and reused by every game and player
+    recorder = GameRecorder(GAME_RECORD_PATH)
 
     for _ in range(100):
-        generate_states()
-
         # MenaceClass = load_agent_from_file("/path/to/menace.py", "Menace")
         #
         # for path, cls_name in external_agents:
@@ -199,11 +234,14 @@ def main():
 
         #board = Board(3, '222010101')
         #game = game_setup(board, 2)
-        game = game_setup()
+        game = game_setup(states_and_moves=states_and_moves, recorder=recorder)
 
         print('\nStarting game...\n')
         game.play()
 
+    recorder.close()
+    states_and_moves.close()
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
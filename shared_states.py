@@ -0,0 +1,482 @@
+"""
+shared_states.py
+
+Defines a state table that lives in a shared memory segment (or a memory-mapped
+file) so that several training processes can use one copy of the game states,
+their legal moves, and the agent values for each move.
+
+Layout of the buffer (all integers little-endian):
+    header  - magic, format version, board size, number of states, max moves per state
+    keys    - board state strings (size*size ascii bytes each), sorted
+    counts  - number of legal moves for each state (1 byte each)
+    moves   - max_moves (from_row, from_col, to_row, to_col) byte tuples per state
+    values  - max_moves float64 values per state (e.g. MENACE bead counts)
+
+Update semantics:
+    Keys, counts, and moves are written once when the table is created and are
+    read-only afterwards. Values are shared by every attached process. Workers
+    should collect their updates in a WorkerDeltas and merge them periodically
+    while holding a lock shared by all workers.
+
+File-backed tables:
+    Values written through a table opened with open_file() are saved in the
+    file, so they carry over between runs. Delete the file to reset them.
+    write_file() writes a temporary file and renames it into place, so a
+    table file is either complete or absent. _FORMAT_VERSION must be raised
+    whenever the layout (or the game rules the stored moves came from)
+    changes, so that older files are rejected instead of misread.
+
+NOTES:
+    only the creating process should call unlink(). On Python < 3.13 attach()
+    keeps the segment out of the resource tracker so that a worker exiting
+    does not remove it for every other process.
+"""
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from collections.abc import Mapping
+from multiprocessing import resource_tracker, shared_memory
+
+
+def _align(offset, alignment=8):
+    return (offset + alignment - 1) // alignment * alignment
+
+
+_MAGIC = b'HXST'
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct('<4sIIII')
+_HEADER_SIZE = _align(_HEADER.size) # header padded to an 8 byte boundary
+
+
+def _layout(size, num_states, max_moves):
+    """
+    Computes the offsets of each section of the buffer.
+
+    Args:
+        size (int): The size of the board (number of rows or columns).
+        num_states (int): The number of states in the table.
+        max_moves (int): The most legal moves of any state in the table.
+
+    Returns:
+        (tuple): (keys, counts, moves, values, total) byte offsets.
+    """
+    keys_off = _HEADER_SIZE
+    counts_off = keys_off + num_states * size * size
+    moves_off = counts_off + num_states
+    values_off = _align(moves_off + num_states * max_moves * 4)
+    total = values_off + num_states * max_moves * 8
+    return keys_off, counts_off, moves_off, values_off, total
+
+
+def _table_size(states_and_moves, size):
+    """
+    Gets the number of bytes needed to hold a table.
+
+    Args:
+        states_and_moves (dict): Maps game states to legal moves.
+        size (int): The size of the board (number of rows or columns).
+
+    Returns:
+        (tuple): (total bytes, max moves per state).
+    """
+    max_moves = max((len(moves) for moves in states_and_moves.values()), default=0)
+    if max_moves > 255:
+        raise ValueError('A state cannot have more than 255 legal moves.')
+    return _layout(size, len(states_and_moves), max_moves)[-1], max_moves
+
+
+def _write_table(buf, states_and_moves, size, max_moves, initial_value):
+    """
+    Writes a table into an empty buffer.
+
+    Args:
+        buf (memoryview): A writable buffer at least as large as the table.
+        states_and_moves (dict): Maps game states to legal moves.
+        size (int): The size of the board (number of rows or columns).
+        max_moves (int): The most legal moves of any state in the table.
+        initial_value (float): The starting value of every move.
+    """
+    cells = size * size
+    states = sorted(states_and_moves)
+    keys_off, counts_off, moves_off, values_off, _ = _layout(size, len(states), max_moves)
+
+    _HEADER.pack_into(buf, 0, _MAGIC, _FORMAT_VERSION, size, len(states), max_moves)
+
+    for index, state in enumerate(states):
+        if len(state) != cells:
+            raise ValueError(f'Board state string must have {size}x{size} elements.')
+        buf[keys_off + index*cells:keys_off + (index+1)*cells] = state.encode('ascii')
+
+        moves = states_and_moves[state]
+        buf[counts_off + index] = len(moves)
+        for move_idx, ((from_row, from_col), (to_row, to_col)) in enumerate(moves):
+            offset = moves_off + (index*max_moves + move_idx) * 4
+            buf[offset:offset+4] = bytes((from_row, from_col, to_row, to_col))
+
+    values = buf[values_off:values_off + len(states)*max_moves*8].cast('d')
+    for slot in range(len(values)):
+        values[slot] = initial_value
+    values.release()
+
+
+def _attach_untracked(name):
+    """
+    Attaches to a shared memory segment without registering it with the
+    resource tracker, which would unlink it when this process exits. Skipping
+    registration (rather than unregistering afterwards) also keeps forked
+    workers, which share the creator's tracker, from removing its entry.
+
+    Args:
+        name (str): The name of the segment.
+
+    Returns:
+        (SharedMemory): The segment.
+    """
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+class SharedStateTable(Mapping):
+    """
+    A read-only map of game states to legal moves, plus a shared value for each
+    (state, move) pair, backed by a shared memory segment or memory-mapped file.
+
+    Behaves like the states_and_moves dict from main.generate_states(), so it
+    can be passed to agents in its place.
+    """
+
+    def __init__(self, buf, owner=None):
+        """
+        Constructor. Use create(), attach(), or open_file() instead.
+
+        Args:
+            buf (memoryview): The buffer holding the table.
+            owner: The SharedMemory or mmap object that the buffer belongs to.
+        """
+        if len(buf) < _HEADER_SIZE:
+            raise ValueError('Buffer is too small to contain a state table.')
+        magic, version, self.size, self.num_states, self.max_moves = _HEADER.unpack_from(buf, 0)
+        if magic != _MAGIC:
+            raise ValueError('Buffer does not contain a state table.')
+        if version != _FORMAT_VERSION:
+            raise ValueError(f'State table format version {version} is not supported (expected {_FORMAT_VERSION}).')
+        if len(buf) < _layout(self.size, self.num_states, self.max_moves)[-1]:
+            raise ValueError('State table is incomplete.')
+
+        self._owner = owner
+        self._buf = buf
+        self._closed = False
+        self._cells = self.size * self.size
+        self._keys_off, self._counts_off, self._moves_off, values_off, _ = \
+            _layout(self.size, self.num_states, self.max_moves)
+        self.move_values = buf[values_off:values_off + self.num_states*self.max_moves*8].cast('d')
+
+
+    @classmethod
+    def create(cls, states_and_moves, size=3, name=None, initial_value=0.0):
+        """
+        Creates a new shared memory segment holding the given states.
+
+        Args:
+            states_and_moves (dict): Maps game states to legal moves.
+            size (int): The size of the board (number of rows or columns).
+            name (str): The name of the segment. Optional, a random name is used if not given.
+            initial_value (float): The starting value of every move.
+
+        Returns:
+            (SharedStateTable): The table. Workers attach to it using its name.
+        """
+        total, max_moves = _table_size(states_and_moves, size)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=total)
+        _write_table(shm.buf, states_and_moves, size, max_moves, initial_value)
+        return cls(shm.buf, shm)
+
+
+    @classmethod
+    def attach(cls, name):
+        """
+        Attaches to an existing shared memory segment without copying it.
+
+        Args:
+            name (str): The name of the segment.
+
+        Returns:
+            (SharedStateTable): The table.
+        """
+        if sys.version_info >= (3, 13):
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            shm = _attach_untracked(name)
+        return cls(shm.buf, shm)
+
+
+    @staticmethod
+    def write_file(path, states_and_moves, size=3, initial_value=0.0):
+        """
+        Writes the given states to a file that can later be opened with open_file().
+        The file is written under a temporary name and then renamed, so other
+        processes never see a partly written table.
+
+        Args:
+            path (str): The file to write.
+            states_and_moves (dict): Maps game states to legal moves.
+            size (int): The size of the board (number of rows or columns).
+            initial_value (float): The starting value of every move.
+        """
+        total, max_moves = _table_size(states_and_moves, size)
+        data = bytearray(total)
+        _write_table(memoryview(data), states_and_moves, size, max_moves, initial_value)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+
+    @classmethod
+    def open_file(cls, path):
+        """
+        Memory-maps a table file. Value updates are written back to the file.
+
+        Args:
+            path (str): The file written by write_file().
+
+        Returns:
+            (SharedStateTable): The table.
+        """
+        with open(path, 'r+b') as file:
+            mapped = mmap.mmap(file.fileno(), 0)
+        view = memoryview(mapped)
+        try:
+            return cls(view, mapped)
+        except ValueError:
+            view.release()
+            mapped.close()
+            raise
+
+
+    @property
+    def name(self):
+        """
+        Returns:
+            (str): The name of the shared memory segment, or None if file-backed.
+        """
+        return getattr(self._owner, 'name', None)
+
+
+    def _key(self, index):
+        offset = self._keys_off + index * self._cells
+        return bytes(self._buf[offset:offset + self._cells])
+
+
+    def index(self, state):
+        """
+        Gets the position of a state in the table.
+
+        Args:
+            state (str): A string representation of the board.
+
+        Returns:
+            index (int): The position of the state.
+        """
+        key = state.encode('ascii') if isinstance(state, str) else b''
+        low, high = 0, self.num_states
+        while low < high:
+            mid = (low + high) // 2
+            if self._key(mid) < key:
+                low = mid + 1
+            else:
+                high = mid
+        if low == self.num_states or self._key(low) != key:
+            raise KeyError(state)
+        return low
+
+
+    def moves_at(self, index):
+        """
+        Gets the legal moves of the state at a given position.
+
+        Args:
+            index (int): The position of the state.
+
+        Returns:
+            moves (list): A list of from position --> to position tuples.
+        """
+        moves = []
+        for move_idx in range(self._buf[self._counts_off + index]):
+            offset = self._moves_off + (index*self.max_moves + move_idx) * 4
+            from_row, from_col, to_row, to_col = self._buf[offset:offset+4]
+            moves.append(((from_row, from_col), (to_row, to_col)))
+        return moves
+
+
+    def slot(self, state, move):
+        """
+        Gets the position in values of a (state, move) pair.
+
+        Args:
+            state (str): A string representation of the board.
+            move (tuple): The move as a tuple of (row, column) tuples.
+
+        Returns:
+            slot (int): The position of the value.
+        """
+        index = self.index(state)
+        return index * self.max_moves + self.moves_at(index).index(move)
+
+
+    def get_values(self, state):
+        """
+        Gets the values of each legal move from a state.
+
+        Args:
+            state (str): A string representation of the board.
+
+        Returns:
+            (list): The values, in the same order as the legal moves.
+        """
+        index = self.index(state)
+        start = index * self.max_moves
+        return list(self.move_values[start:start + self._buf[self._counts_off + index]])
+
+
+    def __getitem__(self, state):
+        return self.moves_at(self.index(state))
+
+
+    def __iter__(self):
+        for index in range(self.num_states):
+            yield self._key(index).decode('ascii')
+
+
+    def __len__(self):
+        return self.num_states
+
+
+    def __contains__(self, state):
+        try:
+            self.index(state)
+        except KeyError:
+            return False
+        return True
+
+
+    def _release(self):
+        """
+        Releases the views into the buffer, which must be done before the
+        shared memory segment or mmap can be closed.
+        """
+        if 'move_values' in self.__dict__:
+            self.move_values.release()
+        if isinstance(getattr(self, '_owner', None), mmap.mmap):
+            self._buf.release()
+
+
+    def close(self):
+        """
+        Detaches from the table. Does not remove the shared memory segment.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._release()
+        self._owner.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    def __del__(self):
+        # release the views even if close() was never called, so the owner can be garbage-collected cleanly
+        self._release()
+
+
+    def unlink(self):
+        """
+        Removes the shared memory segment. Only the creating process should call this.
+        """
+        if isinstance(self._owner, shared_memory.SharedMemory):
+            self._owner.unlink()
+
+
+class WorkerDeltas:
+    """
+    Value updates made by one worker that have not yet been merged into the
+    shared table.
+    """
+
+    def __init__(self, table):
+        """
+        Constructor.
+
+        Args:
+            table (SharedStateTable): The shared table the updates belong to.
+        """
+        self.table = table
+        self.deltas = {} # maps value slots to pending changes
+
+
+    def add(self, state, move, amount):
+        """
+        Records a change to the value of a move.
+
+        Args:
+            state (str): A string representation of the board.
+            move (tuple): The move as a tuple of (row, column) tuples.
+            amount (float): The change to the value.
+        """
+        slot = self.table.slot(state, move)
+        self.deltas[slot] = self.deltas.get(slot, 0.0) + amount
+
+
+    def get_value(self, state, move):
+        """
+        Gets the value of a move as seen by this worker (shared value plus pending change).
+
+        Args:
+            state (str): A string representation of the board.
+            move (tuple): The move as a tuple of (row, column) tuples.
+
+        Returns:
+            (float): The value.
+        """
+        slot = self.table.slot(state, move)
+        return self.table.move_values[slot] + self.deltas.get(slot, 0.0)
+
+
+    def merge(self, lock=None):
+        """
+        Adds the pending changes to the shared table and clears them.
+
+        Args:
+            lock: A multiprocessing.Lock shared by all workers. Optional if only one process writes.
+
+        Returns:
+            (int): The number of values changed.
+        """
+        if lock is not None:
+            lock.acquire()
+        try:
+            for slot, amount in self.deltas.items():
+                self.table.move_values[slot] += amount
+        finally:
+            if lock is not None:
+                lock.release()
+
+        merged = len(self.deltas)
+        self.deltas.clear()
+        return merged
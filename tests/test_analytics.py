@@ -0,0 +1,146 @@
+"""
+Tests for analytics.py.
+"""
+import numpy as np
+import pytest
+
+from analytics import GameBatch, GameRecorder, GameStats, analyse, decode_state, encode_state, format_game, solve
+from board import Board
+
+START = '222000111'
+
+# (first mover, winner, moves) for four complete 3x3 games
+GAMES = [
+    (1, 1, [((2, 0), (1, 0)), ((0, 1), (1, 1)), ((2, 2), (1, 2))]),
+    (1, 1, [((2, 1), (1, 1)), ((0, 0), (1, 0)), ((1, 1), (0, 2))]),
+    (2, 2, [((0, 0), (1, 0)), ((2, 1), (1, 1)), ((0, 2), (1, 2))]),
+    (1, 2, [((2, 0), (1, 0)), ((0, 1), (1, 1)), ((2, 2), (1, 1)), ((0, 2), (1, 1))]),
+]
+
+
+def _history(moves):
+    board = Board()
+    history = []
+    for move in moves:
+        history.append((board.to_string(), move))
+        board.move_piece(*move)
+    return history
+
+
+@pytest.fixture
+def record_file(tmp_path):
+    path = str(tmp_path / 'games.txt')
+    with GameRecorder(path) as recorder:
+        for first_mover, winner, moves in GAMES:
+            recorder.record(_history(moves), first_mover, winner)
+    return path
+
+
+def test_format_game():
+    assert format_game(_history(GAMES[0][2][:2]), 1, 1) == '1 1 222000111:2010 222100011:0111'
+
+
+def test_recorder_writes_each_game_immediately(tmp_path):
+    path = str(tmp_path / 'games.txt')
+    recorder = GameRecorder(path)
+    recorder.record(_history(GAMES[0][2]), 1, 1)
+    with open(path) as file:
+        assert len(file.readlines()) == 1
+    recorder.close()
+
+
+def test_batch_parsing(record_file):
+    with open(record_file) as file:
+        batch = GameBatch(file.readlines())
+
+    assert len(batch) == 4
+    assert batch.first_movers.tolist() == [1, 1, 2, 1]
+    assert batch.winners.tolist() == [1, 1, 2, 2]
+    assert batch.lengths.tolist() == [3, 3, 3, 4]
+    assert batch.offsets.tolist() == [0, 3, 6, 9]
+    assert batch.game_idx.tolist() == [0, 0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 3]
+    assert batch.ply_idx.tolist() == [0, 1, 2, 0, 1, 2, 0, 1, 2, 0, 1, 2, 3]
+    assert batch.movers.tolist() == [1, 2, 1, 1, 2, 1, 2, 1, 2, 1, 2, 1, 2]
+    assert ''.join(map(str, batch.states[1])) == '222100011'
+    assert batch.moves[0].tolist() == [2, 0, 1, 0]
+    assert batch.state_codes()[0] == encode_state(START)
+
+
+def test_batch_with_no_games_or_no_plies():
+    assert len(GameBatch([])) == 0
+    batch = GameBatch(['1 2\n'])
+    assert batch.lengths.tolist() == [0]
+    assert batch.states.shape == (0, 9)
+
+
+def test_batch_rejects_malformed_plies():
+    with pytest.raises(ValueError):
+        GameBatch(['1 1 22200011:2010\n'])
+
+
+def test_sizes_above_six_are_rejected():
+    with pytest.raises(ValueError):
+        GameBatch([], size=7)
+    with pytest.raises(ValueError):
+        GameStats(size=7)
+
+
+def test_encode_decode_round_trip():
+    assert decode_state(encode_state('201020112')) == '201020112'
+
+
+def test_solve():
+    solved = solve()
+    assert solved[(START, 1)] == -1 # the second player wins hexapawn
+    assert solved[(START, 2)] == -1
+    assert set(solved.values()) == {-1, 1}
+
+
+def test_aggregates(record_file):
+    stats = analyse(record_file)
+
+    assert stats.games == 4
+    assert stats.win_rate_by_first_mover() == {1: pytest.approx(2/3), 2: 1.0}
+    assert stats.opening_win_rates() == {
+        ((0, 0), (1, 0)): (1, 1.0),
+        ((2, 0), (1, 0)): (2, 0.5),
+        ((2, 1), (1, 1)): (1, 1.0),
+    }
+    assert stats.length_histogram().tolist() == [0, 0, 0, 3, 1]
+
+    codes, players, visits, wins = stats.position_frequencies()
+    start = (codes == encode_state(START))
+    assert visits[start & (players == 1)].tolist() == [3]
+    assert wins[start & (players == 1)].tolist() == [2]
+    assert visits[start & (players == 2)].tolist() == [1]
+    assert wins[start & (players == 2)].tolist() == [1]
+    assert visits.sum() == 13
+
+
+def test_blunder_counting(record_file):
+    stats = analyse(record_file)
+
+    # player 2 throws away a won position on ply 1 of games 1, 2 and 4, player 1
+    # on ply 1 of game 3 and ply 2 of game 4; final plies are winning chances taken
+    assert stats.blunders.tolist() == [0, 2, 3]
+    assert stats.blunder_chances.tolist() == [0, 4, 5]
+    assert stats.blunder_rates() == {1: 0.5, 2: 0.6}
+
+
+def test_empty_solved_table_skips_blunders(record_file):
+    stats = GameStats(3, solved={})
+    with open(record_file) as file:
+        stats.update(GameBatch(file.readlines()))
+
+    assert stats.blunder_rates() == {}
+    assert stats.games == 4
+
+
+def test_batches_merge_like_one_batch(record_file):
+    whole = analyse(record_file)
+    split = analyse(record_file, batch_size=1)
+
+    assert whole.length_histogram().tolist() == split.length_histogram().tolist()
+    for whole_column, split_column in zip(whole.position_frequencies(), split.position_frequencies()):
+        assert np.array_equal(whole_column, split_column)
+    assert whole.blunder_rates() == split.blunder_rates()
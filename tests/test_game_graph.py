@@ -0,0 +1,93 @@
+"""
+Tests for game_graph.py.
+"""
+import os
+import multiprocessing as mp
+
+import pytest
+
+import game_graph
+from game_graph import build_graph, enumerate_graph, expand, load_graph, load_states_and_moves
+
+START = '222000111'
+
+
+def test_expand():
+    assert expand(3, START, 1) == [
+        (((2, 0), (1, 0)), '222100011'),
+        (((2, 1), (1, 1)), '222010101'),
+        (((2, 2), (1, 2)), '222001110'),
+    ]
+    assert expand(3, '212000011', 2) == [] # player 1 has promoted a pawn
+    assert expand(3, '000020010', 1) == [] # player 1 has no legal moves
+
+
+def test_sizes_above_ten_are_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        build_graph(11)
+    with pytest.raises(ValueError):
+        enumerate_graph(11, str(tmp_path / 'graph'))
+    assert not os.path.exists(tmp_path / 'graph')
+
+
+def test_build_graph_node_counts():
+    assert len(build_graph()) == 135
+    assert len(build_graph(start_players=(1, 2))) == 262
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_enumerate_graph_matches_build_graph(tmp_path, workers):
+    out_dir = str(tmp_path / 'graph')
+    assert enumerate_graph(3, out_dir, workers) == 135
+
+    graph = load_graph(out_dir)
+    expected = build_graph()
+    assert set(graph) == set(expected)
+    for node, edges in graph.items():
+        assert sorted(edges) == sorted(expected[node])
+
+
+def test_load_graph_is_in_ply_order(tmp_path):
+    out_dir = str(tmp_path / 'graph')
+    enumerate_graph(4, out_dir, workers=2)
+    graph = load_graph(out_dir)
+
+    assert next(iter(graph)) == ('2222000000001111', 1)
+    assert len(graph) == len(build_graph(4))
+
+
+def test_load_states_and_moves_filters_by_player(tmp_path):
+    out_dir = str(tmp_path / 'graph')
+    enumerate_graph(4, out_dir, workers=2, start_players=(1, 2))
+    graph = load_graph(out_dir)
+
+    for player_position in (1, 2):
+        states_and_moves = load_states_and_moves(player_position, out_dir)
+        assert len(states_and_moves) == sum(1 for _, player in graph if player == player_position)
+        for state, moves in states_and_moves.items():
+            assert moves == [move for move, _ in graph[(state, player_position)]]
+
+
+def test_stale_output_is_cleared(tmp_path):
+    out_dir = str(tmp_path / 'graph')
+    enumerate_graph(3, out_dir, workers=4)
+    assert os.path.exists(os.path.join(out_dir, 'ply_000_003.txt'))
+
+    enumerate_graph(3, out_dir, workers=1)
+    assert not os.path.exists(os.path.join(out_dir, 'ply_000_003.txt'))
+    assert len(load_graph(out_dir)) == 135
+
+
+def _failing_expand(size, state, player):
+    raise OSError('No space left on device')
+
+
+@pytest.mark.skipif(mp.get_start_method() != 'fork', reason='workers must inherit the patched expand()')
+def test_worker_failure_is_raised(tmp_path, monkeypatch):
+    monkeypatch.setattr(game_graph, 'expand', _failing_expand)
+    monkeypatch.setattr(game_graph, '_POLL_SECONDS', 0.1)
+    out_dir = str(tmp_path / 'graph')
+
+    with pytest.raises(RuntimeError):
+        enumerate_graph(3, out_dir, workers=2)
+    assert not os.path.exists(os.path.join(out_dir, 'manifest.txt'))
@@ -0,0 +1,159 @@
+"""
+Tests for shared_states.py.
+"""
+import os
+import subprocess
+import sys
+import multiprocessing as mp
+
+import pytest
+
+import shared_states
+from main import generate_states, load_state_table
+from shared_states import SharedStateTable, WorkerDeltas
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+START = '222000111'
+START_MOVES = [((2, 0), (1, 0)), ((2, 1), (1, 1)), ((2, 2), (1, 2))]
+
+
+@pytest.fixture
+def table():
+    table = SharedStateTable.create(generate_states(), initial_value=3.0)
+    yield table
+    table.close()
+    table.unlink()
+
+
+def _add_one_to_every_move(name, lock):
+    with SharedStateTable.attach(name) as table:
+        deltas = WorkerDeltas(table)
+        for state in table:
+            for move in table[state]:
+                deltas.add(state, move, 1.0)
+        deltas.merge(lock)
+
+
+def test_create_matches_states_and_moves(table):
+    states_and_moves = generate_states()
+    assert len(table) == len(states_and_moves)
+    assert dict(table) == states_and_moves
+    assert table[START] == START_MOVES
+    assert table.get_values(START) == [3.0, 3.0, 3.0]
+    assert '000000000' not in table
+    with pytest.raises(KeyError):
+        table['000000000']
+
+
+def test_worker_deltas_are_pending_until_merged(table):
+    deltas = WorkerDeltas(table)
+    deltas.add(START, START_MOVES[1], 2.0)
+    deltas.add(START, START_MOVES[1], 0.5)
+
+    assert deltas.get_value(START, START_MOVES[1]) == 5.5
+    assert table.get_values(START) == [3.0, 3.0, 3.0]
+    assert deltas.merge() == 1
+    assert table.get_values(START) == [3.0, 5.5, 3.0]
+    assert deltas.deltas == {}
+
+
+def test_merge_under_lock_from_several_processes(table):
+    lock = mp.Lock()
+    processes = [mp.Process(target=_add_one_to_every_move, args=(table.name, lock)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    assert all(value == 7.0 for state in table for value in table.get_values(state))
+
+
+def test_attach_from_separate_process_does_not_remove_segment(table):
+    code = ('from shared_states import SharedStateTable\n'
+            f'table = SharedStateTable.attach({table.name!r})\n'
+            f'table.move_values[0] += 1\n'
+            'table.close()\n')
+    subprocess.run([sys.executable, '-c', code], cwd=REPO_DIR, check=True)
+
+    with SharedStateTable.attach(table.name) as attached:
+        assert attached.move_values[0] == 4.0
+
+
+def test_file_round_trip(tmp_path):
+    path = str(tmp_path / 'states.tbl')
+    SharedStateTable.write_file(path, generate_states(), initial_value=1.0)
+
+    with SharedStateTable.open_file(path) as table:
+        assert table.name is None
+        table.move_values[table.slot(START, START_MOVES[2])] = 9.0
+
+    with SharedStateTable.open_file(path) as table:
+        assert dict(table) == generate_states()
+        assert table.get_values(START) == [1.0, 1.0, 9.0]
+
+
+def test_close_is_safe_to_repeat(table):
+    table.close()
+    table.close()
+
+
+def test_rejects_buffer_without_table():
+    with pytest.raises(ValueError):
+        SharedStateTable(memoryview(bytearray(64)))
+
+
+@pytest.mark.filterwarnings('error::pytest.PytestUnraisableExceptionWarning')
+def test_dropping_attached_table_without_close(table):
+    def crashing_worker():
+        attached = SharedStateTable.attach(table.name)
+        attached.move_values[0] += 1
+        raise RuntimeError('worker crashed')
+
+    with pytest.raises(RuntimeError):
+        crashing_worker()
+    assert table.move_values[0] == 4.0
+
+
+def test_write_file_leaves_no_temporary_files(tmp_path):
+    path = str(tmp_path / 'states.tbl')
+    SharedStateTable.write_file(path, generate_states())
+    SharedStateTable.write_file(path, generate_states())
+    assert os.listdir(tmp_path) == ['states.tbl']
+
+
+@pytest.mark.parametrize('keep', [0, 10, 0.5])
+def test_incomplete_file_is_rejected(tmp_path, keep):
+    path = str(tmp_path / 'states.tbl')
+    SharedStateTable.write_file(path, generate_states())
+    with open(path, 'rb') as file:
+        data = file.read()
+    with open(path, 'wb') as file:
+        file.write(data[:int(len(data) * keep) if isinstance(keep, float) else keep])
+
+    with pytest.raises(ValueError):
+        SharedStateTable.open_file(path)
+
+
+def test_other_format_version_is_rejected(tmp_path, monkeypatch):
+    path = str(tmp_path / 'states.tbl')
+    monkeypatch.setattr(shared_states, '_FORMAT_VERSION', shared_states._FORMAT_VERSION + 1)
+    SharedStateTable.write_file(path, generate_states())
+    monkeypatch.undo()
+
+    with pytest.raises(ValueError):
+        SharedStateTable.open_file(path)
+
+
+def test_load_state_table_rebuilds_unusable_file(tmp_path):
+    path = str(tmp_path / 'states.tbl')
+    SharedStateTable.write_file(path, generate_states())
+    with open(path, 'r+b') as file:
+        file.truncate(os.path.getsize(path) // 2)
+
+    with load_state_table(path) as table:
+        assert dict(table) == generate_states()
+        table.move_values[table.slot(START, START_MOVES[0])] = 5.0
+
+    with load_state_table(path) as table:
+        assert table.get_values(START)[0] == 5.0 # values carry over between runs